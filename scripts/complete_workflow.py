@@ -3,13 +3,189 @@
 Complete workflow script for TinyPay payment process.
 This script demonstrates the full process from initial data to Move contract parameters.
 """
+import binascii
 import hashlib
 import json
-from hex_to_ascii_bytes import hex_to_ascii_bytes
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from hex_to_ascii_bytes import hex_to_ascii_bytes, join_ascii_bytes
 
+# Disk cache for chain results; the chain is a pure function of
+# (initial_data, iterations), so results survive across process runs
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tinypay")
+
+def _chain_cache_path(initial_data: str, iterations: int) -> str:
+    key = hashlib.sha256(f"{iterations}:{initial_data}".encode()).hexdigest()
+    return os.path.join(_CACHE_DIR, f"chain-{key}.json")
+
+def _chain_cache_get(initial_data: str, iterations: int):
+    """Return a cached (otp_hex, tail_hex) pair, or None on miss."""
+    try:
+        with open(_chain_cache_path(initial_data, iterations)) as f:
+            cached = json.load(f)
+        return cached["otp_hex"], cached["tail_hex"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _chain_cache_put(initial_data: str, iterations: int, otp_hex: str, tail_hex: str) -> None:
+    """Store a chain result; cache failures are never fatal."""
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        with open(_chain_cache_path(initial_data, iterations), "w") as f:
+            json.dump({"otp_hex": otp_hex, "tail_hex": tail_hex}, f)
+    except OSError:
+        pass
+
+def _sha256_chain(buf: bytearray, rounds: int) -> None:
+    """
+    Advance the hex hash chain in place by the given number of rounds.
+
+    buf always holds the 64 hex-ASCII bytes of the previous digest; each
+    round hashes it and writes the new digest's hex bytes back into it.
+    Kept as a dedicated kernel so the hot loop carries nothing but the
+    C-level hash and hex-encode calls.
+    """
+    sha256 = hashlib.sha256
+    b2a_hex = binascii.b2a_hex
+    for _ in range(rounds):
+        buf[:] = b2a_hex(sha256(buf).digest())
+
+class HashChainPebbler:
+    """
+    Reveal a payment hash chain backwards without recomputing it.
+
+    An OTP scheme reveals chain[n-2], then chain[n-3], and so on; naively
+    each reveal rehashes the whole chain from the seed. The pebbler keeps
+    a small set of anchor values along the chain, walks each reveal from
+    the nearest anchor, and drops a new anchor halfway through every walk
+    so later (earlier-position) reveals start closer — O(log n) storage
+    and amortized O(log n) hashes per reveal instead of O(n).
+
+    State can be persisted to a JSON file so reveals stay cheap across
+    process runs.
+    """
+
+    def __init__(self, seed: str, iterations: int = 1000, state_path: str = None):
+        self.seed = seed
+        self.iterations = iterations
+        self.state_path = state_path
+        self._anchors = {}  # chain position -> hex value at that position
+        self._next = iterations - 2  # position of the next OTP to reveal
+        if state_path:
+            self._load()
+
+    @property
+    def tail_hex(self) -> str:
+        """The chain tail (position n-1) the contract stores on deposit."""
+        return self._materialize(self.iterations - 1)
+
+    def reveal_next(self) -> str:
+        """Reveal the next OTP, one position earlier than the previous one."""
+        if self._next < 0:
+            raise ValueError("hash chain exhausted")
+        value = self.reveal(self._next)
+        return value
+
+    def reveal(self, position: int) -> str:
+        """
+        Reveal the chain value at the given position (0-based).
+
+        Reveals are expected to move backwards; anchors past the revealed
+        position are dropped since the chain is never walked forward again.
+        """
+        if not 0 <= position < self.iterations:
+            raise ValueError(f"position {position} outside chain of length {self.iterations}")
+        value = self._materialize(position)
+        for p in [p for p in self._anchors if p >= position]:
+            del self._anchors[p]
+        self._next = position - 1
+        if self.state_path:
+            self._save()
+        return value
+
+    def _materialize(self, position: int) -> str:
+        """Walk to a chain position from the nearest stored anchor."""
+        starts = [p for p in self._anchors if p <= position]
+        if starts:
+            at = max(starts)
+            value = self._anchors[at]
+        else:
+            at = 0
+            value = hashlib.sha256(self.seed.encode()).hexdigest()
+            self._anchors[0] = value
+        mid = (at + position) // 2
+        while at < position:
+            value = hashlib.sha256(value.encode("ascii")).hexdigest()
+            at += 1
+            if at == mid:
+                self._anchors[at] = value
+        return value
+
+    def _load(self) -> None:
+        """Restore anchors from the state file if it matches this chain."""
+        import os
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state.get("seed_hash") != hashlib.sha256(self.seed.encode()).hexdigest() \
+                or state.get("iterations") != self.iterations:
+            return
+        self._anchors = {int(p): v for p, v in state["anchors"].items()}
+        self._next = state["next"]
+
+    def _save(self) -> None:
+        """Persist anchors keyed by the seed's hash (never the seed itself)."""
+        state = {
+            "seed_hash": hashlib.sha256(self.seed.encode()).hexdigest(),
+            "iterations": self.iterations,
+            "next": self._next,
+            "anchors": self._anchors,
+        }
+        with open(self.state_path, "w") as f:
+            json.dump(state, f)
+
+def _chain_tail_pair(initial_data: str, iterations: int) -> tuple[str, str]:
+    """
+    Run the chain silently and return (otp_hex, tail_hex).
+
+    Same values as complete_payment_workflow, without the printing —
+    suitable for batch and programmatic use.
+    """
+    if iterations <= 1:
+        return initial_data, hashlib.sha256(initial_data.encode()).hexdigest()
+    buf = bytearray(64)
+    buf[:] = binascii.b2a_hex(hashlib.sha256(initial_data.encode()).digest())
+    _sha256_chain(buf, iterations - 2)
+    otp_hex = buf.decode("ascii")
+    _sha256_chain(buf, 1)
+    return otp_hex, buf.decode("ascii")
+
+def complete_payment_workflow_batch(seeds: list[str], iterations: int = 1000) -> list[tuple[str, str]]:
+    """
+    Prepare (otp_hex, tail_hex) pairs for many seeds at once.
+
+    The chains are independent and compute-bound, so they are fanned
+    out across worker processes, one chain per seed.
+
+    Args:
+        seeds: Initial data strings, one per payment chain
+        iterations: Number of SHA256 iterations per chain
+
+    Returns:
+        List of (otp_hex, tail_hex) pairs in seed order
+    """
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(partial(_chain_tail_pair, iterations=iterations), seeds))
+
+@lru_cache(maxsize=128)
 def complete_payment_workflow(initial_data: str, iterations: int = 1000):
     """
     Complete workflow for preparing payment data for Move contract.
+
+    Results are memoized in-process and the chain result is cached on
+    disk, so repeat invocations with the same inputs skip the chain.
     
     Args:
         initial_data: Initial string data
@@ -23,28 +199,59 @@ def complete_payment_workflow(initial_data: str, iterations: int = 1000):
     print(f"Iterations: {iterations}")
     print()
     
-    # Step 1: Perform iterative hashing
-    s = initial_data.encode()
-    iteration_results = []
-    
-    for i in range(iterations):
-        h = hashlib.sha256(s).hexdigest()
-        iteration_results.append(h)
-        if i < 3 or i >= iterations - 3:  # Show first 3 and last 3
-            print(f"Iteration {i+1}: {h}")
-        elif i == 3:
-            print("...")
-        s = h.encode("ascii")
-    
-    print()
-    
-    # Step 2: Prepare Move contract parameters
-    if iterations > 1:
-        otp_hex = iteration_results[-2]  # Second to last iteration
-        tail_hex = iteration_results[-1]  # Final iteration
+    # Step 1: Perform iterative hashing (skipped when this exact chain
+    # is already in the disk cache — the chain is deterministic)
+    cached = _chain_cache_get(initial_data, iterations)
+    if cached is not None:
+        otp_hex, tail_hex = cached
+        print("Chain result loaded from cache")
+        print()
     else:
-        otp_hex = initial_data
-        tail_hex = iteration_results[0]
+        # Each round feeds the 64-char hex-ASCII form of the previous
+        # digest into the next SHA256, so a single 64-byte buffer can
+        # carry the chain. Hex strings are only materialized for the
+        # printed head/tail rounds and the two values the contract call
+        # actually needs.
+        sha256 = hashlib.sha256
+        b2a_hex = binascii.b2a_hex
+        buf = bytearray(64)
+        prev_hex = None
+        cur_hex = None
+
+        head_end = min(3, iterations)
+        tail_start = max(head_end, iterations - 3)
+
+        # Head: the seed round(s), printed
+        s = initial_data.encode()
+        for i in range(head_end):
+            buf[:] = b2a_hex(sha256(s).digest())
+            s = buf
+            prev_hex, cur_hex = cur_hex, buf.decode("ascii")
+            print(f"Iteration {i+1}: {cur_hex}")
+
+        if tail_start > head_end:
+            print("...")
+
+        # Middle: the hot bulk of the chain, no string conversion and no I/O
+        _sha256_chain(buf, tail_start - head_end)
+
+        # Tail: the final rounds, printed and retained for the result
+        for i in range(tail_start, iterations):
+            buf[:] = b2a_hex(sha256(buf).digest())
+            prev_hex, cur_hex = cur_hex, buf.decode("ascii")
+            print(f"Iteration {i+1}: {cur_hex}")
+
+        print()
+
+        # Step 2: Prepare Move contract parameters
+        if iterations > 1:
+            otp_hex = prev_hex  # Second to last iteration
+            tail_hex = cur_hex  # Final iteration
+        else:
+            otp_hex = initial_data
+            tail_hex = cur_hex
+
+        _chain_cache_put(initial_data, iterations, otp_hex, tail_hex)
     
     # Step 3: Convert to ASCII bytes
     otp_ascii_bytes = hex_to_ascii_bytes(otp_hex)
@@ -53,13 +260,14 @@ def complete_payment_workflow(initial_data: str, iterations: int = 1000):
     # Step 4: Prepare results
     result = {
         "otp_hex": otp_hex,
+        "opt_hex": otp_hex,  # compatibility alias for the older "opt" naming
         "tail_hex": tail_hex,
         "otp_ascii_bytes": otp_ascii_bytes,
         "tail_ascii_bytes": tail_ascii_bytes,
         "otp_json": json.dumps(otp_ascii_bytes),
         "tail_json": json.dumps(tail_ascii_bytes),
-        "aptos_otp_format": f"u8:[{','.join(map(str, otp_ascii_bytes))}]",
-        "aptos_tail_format": f"u8:[{','.join(map(str, tail_ascii_bytes))}]"
+        "aptos_otp_format": f"u8:[{join_ascii_bytes(otp_ascii_bytes)}]",
+        "aptos_tail_format": f"u8:[{join_ascii_bytes(tail_ascii_bytes)}]"
     }
     
     # Step 5: Verification
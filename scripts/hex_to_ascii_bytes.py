@@ -4,6 +4,10 @@ Utility functions for converting hex strings to ASCII bytes.
 Used in TinyPay payment processing workflow.
 """
 
+# Decimal string for every possible byte value, computed once so CLI
+# formatting joins precomputed strings instead of calling str() per byte
+_ORD2STR = [str(i) for i in range(256)]
+
 def hex_to_ascii_bytes(hex_string: str) -> list[int]:
     """
     Convert a hex string to a list of ASCII byte values.
@@ -24,14 +28,9 @@ def hex_to_ascii_bytes(hex_string: str) -> list[int]:
     # Remove 0x prefix if present
     if hex_string.startswith('0x'):
         hex_string = hex_string[2:]
-    
-    # Convert each character of the hex string to its ASCII byte value
-    ascii_bytes = []
-    for char in hex_string:
-        ascii_value = ord(char)
-        ascii_bytes.append(ascii_value)
-    
-    return ascii_bytes
+
+    # The ASCII byte values are exactly the string's ASCII encoding
+    return list(hex_string.encode('ascii'))
 
 def ascii_bytes_to_hex(ascii_bytes: list[int]) -> str:
     """
@@ -46,7 +45,7 @@ def ascii_bytes_to_hex(ascii_bytes: list[int]) -> str:
     Example:
         ascii_bytes_to_hex([72, 101, 108, 108, 111]) -> "48656c6c6f"
     """
-    return ''.join(f'{byte:02x}' for byte in ascii_bytes)
+    return bytes(ascii_bytes).hex()
 
 def ascii_bytes_to_string(ascii_bytes: list[int]) -> str:
     """
@@ -61,7 +60,22 @@ def ascii_bytes_to_string(ascii_bytes: list[int]) -> str:
     Example:
         ascii_bytes_to_string([72, 101, 108, 108, 111]) -> "Hello"
     """
-    return ''.join(chr(byte) for byte in ascii_bytes)
+    return bytes(ascii_bytes).decode('ascii')
+
+def join_ascii_bytes(ascii_bytes: list[int]) -> str:
+    """
+    Comma-join byte values for CLI vector parameters.
+
+    Args:
+        ascii_bytes: List of integers representing ASCII byte values
+
+    Returns:
+        Comma-separated decimal string
+
+    Example:
+        join_ascii_bytes([72, 101, 108]) -> "72,101,108"
+    """
+    return ','.join(_ORD2STR[b] for b in ascii_bytes)
 
 def format_for_aptos_cli(ascii_bytes: list[int]) -> str:
     """
@@ -76,7 +90,7 @@ def format_for_aptos_cli(ascii_bytes: list[int]) -> str:
     Example:
         format_for_aptos_cli([72, 101, 108, 108, 111]) -> "vector<u8>:[72,101,108,108,111]"
     """
-    return f"vector<u8>:[{','.join(map(str, ascii_bytes))}]"
+    return f"vector<u8>:[{join_ascii_bytes(ascii_bytes)}]"
 
 def main():
     """
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Move-compatible serialization and hashing helpers for TinyPay.
+Produces BCS-like byte layouts so off-chain code can hash data the same
+way the Move contract sees it.
+"""
+import hashlib
+import struct
+
+def serialize_to_bcs_like(data) -> bytes:
+    """
+    Serialize a Python value into a BCS-like byte string.
+
+    Supported types: bool, int (u64 little-endian), str, bytes, list,
+    and dict (serialized as a struct, fields in key order). As in real
+    BCS, lengths are ULEB128-encoded; use the u8/u16/u32/u64/u128
+    helpers to emit ints at a specific Move width. Containers are
+    written into a single growing bytearray rather than built by bytes
+    concatenation, so serializing n elements stays O(n).
+
+    Args:
+        data: Value to serialize
+
+    Returns:
+        Serialized bytes
+
+    Example:
+        serialize_to_bcs_like([1, 2]).hex() -> "0201000000000000000200000000000000"
+    """
+    ba = bytearray()
+    _write(ba, data)
+    return bytes(ba)
+
+def _uleb128(ba: bytearray, n: int) -> None:
+    """Append the ULEB128 encoding of a non-negative length to ba."""
+    while n >= 0x80:
+        ba.append((n & 0x7f) | 0x80)
+        n >>= 7
+    ba.append(n)
+
+def u8(value: int) -> bytes:
+    """Encode an int as a Move u8 (1 byte)."""
+    return struct.pack("<B", value)
+
+def u16(value: int) -> bytes:
+    """Encode an int as a Move u16 (2 bytes little-endian)."""
+    return struct.pack("<H", value)
+
+def u32(value: int) -> bytes:
+    """Encode an int as a Move u32 (4 bytes little-endian)."""
+    return struct.pack("<I", value)
+
+def u64(value: int) -> bytes:
+    """Encode an int as a Move u64 (8 bytes little-endian)."""
+    return struct.pack("<Q", value)
+
+def u128(value: int) -> bytes:
+    """Encode an int as a Move u128 (16 bytes little-endian)."""
+    return value.to_bytes(16, 'little')
+
+def _write(ba: bytearray, data) -> None:
+    """Append the BCS-like encoding of data to ba."""
+    if isinstance(data, bool):
+        ba.append(1 if data else 0)
+    elif isinstance(data, int):
+        if not 0 <= data < 1 << 64:
+            raise ValueError(f"int out of u64 range: {data} (use the typed helpers for other widths)")
+        ba.extend(data.to_bytes(8, 'little'))
+    elif isinstance(data, (bytes, bytearray)):
+        _uleb128(ba, len(data))
+        ba.extend(data)
+    elif isinstance(data, str):
+        encoded = data.encode('utf-8')
+        _uleb128(ba, len(encoded))
+        ba.extend(encoded)
+    elif isinstance(data, list):
+        _uleb128(ba, len(data))
+        if data and all(type(item) is int and 0 <= item < 1 << 64 for item in data):
+            # Fast path: pack homogeneous int lists in one call
+            ba.extend(struct.pack(f"<{len(data)}Q", *data))
+        else:
+            for item in data:
+                _write(ba, item)
+    elif isinstance(data, dict):
+        for value in data.values():
+            _write(ba, value)
+    else:
+        raise TypeError(f"Unsupported type for BCS-like serialization: {type(data).__name__}")
+
+def move_compatible_hash(data) -> str:
+    """
+    Hash a value's BCS-like serialization with SHA256.
+
+    Args:
+        data: Value to serialize and hash
+
+    Returns:
+        SHA256 hex digest of the serialized bytes
+    """
+    return hashlib.sha256(serialize_to_bcs_like(data)).hexdigest()
+
+def main():
+    """
+    Command line interface for BCS-like serialization.
+    """
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Serialize JSON data BCS-like and hash it")
+    parser.add_argument("data", help="JSON value to serialize")
+    parser.add_argument("--format", choices=["hex", "hash"],
+                       default="hex", help="Output format")
+
+    args = parser.parse_args()
+
+    try:
+        data = json.loads(args.data)
+    except json.JSONDecodeError as e:
+        print(f"Error: Invalid JSON - {e}")
+        return 1
+
+    try:
+        if args.format == "hex":
+            print(serialize_to_bcs_like(data).hex())
+        elif args.format == "hash":
+            print(move_compatible_hash(data))
+    except (TypeError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -4,16 +4,43 @@ TinyPay USDC 设置脚本
 用于快速设置测试网 USDC 环境
 """
 
+import re
 import subprocess
 import sys
 import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List, Dict, Any
 
+# 发布输出中的包地址（模块级编译一次）
+_ADDR_RE = re.compile(r'0x[0-9a-fA-F]{40,64}')
+
+try:
+    import requests
+except ImportError:  # REST 快速路径是可选的，CLI 路径仍然可用
+    requests = None
+
+# Aptos 测试网全节点 REST 地址
+DEFAULT_NODE_URL = "https://fullnode.testnet.aptoslabs.com/v1"
+
 class USDCSetup:
-    def __init__(self, profile: str = "default"):
+    def __init__(self, profile: str = "default", node_url: str = DEFAULT_NODE_URL):
         self.profile = profile
         self.package_address = None
-        
+        self.node_url = node_url.rstrip("/")
+        # view 调用复用同一个 HTTP 连接，省掉每次拉起 aptos CLI 进程的开销
+        self._session = requests.Session() if requests else None
+
+    def view_via_rest(self, function_id: str, args: List[Any] = None, type_args: List[str] = None) -> Any:
+        """通过全节点 REST API 调用 view 函数（持久连接）"""
+        payload = {
+            "function": function_id,
+            "type_arguments": type_args or [],
+            "arguments": args or [],
+        }
+        response = self._session.post(f"{self.node_url}/view", json=payload, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
     def run_command(self, cmd: List[str]) -> Dict[str, Any]:
         """运行命令并返回结果"""
         try:
@@ -43,21 +70,15 @@ class USDCSetup:
         ])
         
         if result["success"]:
-            # 尝试从输出中提取包地址
+            # 尝试从输出中提取包地址：只在部署确认信息之后查找，
+            # 避免匹配到前面的交易哈希或发送者地址
             output = result["output"]
-            if "Code was successfully deployed" in output:
-                # 解析包地址
-                lines = output.split('\n')
-                for line in lines:
-                    if "package" in line.lower() and "0x" in line:
-                        # 简单的地址提取
-                        parts = line.split()
-                        for part in parts:
-                            if part.startswith("0x") and len(part) > 10:
-                                self.package_address = part
-                                break
-                        break
-        
+            marker = "Code was successfully deployed"
+            if marker in output:
+                match = _ADDR_RE.search(output, output.index(marker))
+                if match:
+                    self.package_address = match.group(0)
+
         return result["success"]
     
     def initialize_usdc(self) -> bool:
@@ -106,6 +127,18 @@ class USDCSetup:
             address = "@tinypay"  # 使用默认地址
         
         print(f"💳 检查 {address} 的 USDC 余额...")
+        # 优先走 REST（需要真实包地址和真实账户地址），失败时回退 CLI
+        if self._session and self.package_address and not address.startswith("@"):
+            try:
+                result = self.view_via_rest(
+                    f"{self.package_address}::test_usdc::get_balance",
+                    args=[address]
+                )
+                print(f"✅ 余额: {result}")
+                return True
+            except Exception as e:
+                print(f"⚠️ REST 查询失败，回退到 CLI: {e}")
+
         result = self.run_command([
             "aptos", "move", "view",
             "--function-id", f"{self.package_address or '@tinypay'}::test_usdc::get_balance",
@@ -124,25 +157,56 @@ class USDCSetup:
         return result["success"]
     
     def setup_complete_environment(self) -> bool:
-        """完整的环境设置"""
+        """完整的环境设置（互不依赖的步骤并行执行）"""
         print("🚀 开始设置 TinyPay USDC 环境...\n")
-        
-        steps = [
-            ("编译包", self.compile_package),
-            ("发布包", self.publish_package),
-            ("初始化 USDC", self.initialize_usdc),
-            ("添加 USDC 支持", self.add_usdc_support),
-            ("铸造测试 USDC", self.mint_usdc_to_admin),
-            ("检查余额", self.check_usdc_balance),
-        ]
-        
-        for step_name, step_func in steps:
-            print(f"\n📋 执行步骤: {step_name}")
-            if not step_func():
-                print(f"❌ 步骤失败: {step_name}")
-                return False
-            print(f"✅ 步骤完成: {step_name}")
-        
+
+        # 步骤依赖图：改链状态的交易都由同一账户签名，并发提交会
+        # 竞争账户序列号导致随机失败，因此串成一条链；只有只读步骤
+        # （如检查余额）才适合并行挂在依赖后面
+        steps = {
+            "编译包": (self.compile_package, ()),
+            "发布包": (self.publish_package, ("编译包",)),
+            "初始化 USDC": (self.initialize_usdc, ("发布包",)),
+            "添加 USDC 支持": (self.add_usdc_support, ("初始化 USDC",)),
+            "铸造测试 USDC": (self.mint_usdc_to_admin, ("添加 USDC 支持",)),
+            "检查余额": (self.check_usdc_balance, ("铸造测试 USDC",)),
+        }
+
+        done = set()
+        failed = False
+        futures = {}  # future -> 步骤名
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            while len(done) < len(steps) and not failed:
+                pending_names = set(futures.values())
+                for step_name, (step_func, deps) in steps.items():
+                    if step_name in done or step_name in pending_names:
+                        continue
+                    if all(dep in done for dep in deps):
+                        print(f"\n📋 执行步骤: {step_name}")
+                        futures[pool.submit(step_func)] = step_name
+                if not futures:
+                    break
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step_name = futures.pop(future)
+                    try:
+                        success = future.result()
+                    except Exception as e:
+                        print(f"错误: {e}")
+                        success = False
+                    if success:
+                        print(f"✅ 步骤完成: {step_name}")
+                        done.add(step_name)
+                    else:
+                        print(f"❌ 步骤失败: {step_name}")
+                        failed = True
+            # 失败时快速退出，取消尚未开始的步骤
+            for future in futures:
+                future.cancel()
+
+        if failed or len(done) < len(steps):
+            return False
+
         print("\n🎉 USDC 环境设置完成!")
         print("\n📝 接下来你可以:")
         print("1. 使用 tinypay::test_usdc::register 注册账户")
@@ -4,56 +4,378 @@ TinyPay USDC 演示脚本
 展示如何使用 USDC 功能的完整流程
 """
 
+import json
+import os
+import signal
 import subprocess
 import sys
+import threading
 import time
-from typing import List, Dict, Any
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import requests
+except ImportError:  # REST 快速路径是可选的，CLI 路径仍然可用
+    requests = None
+
+# Aptos 测试网全节点 REST 地址
+DEFAULT_NODE_URL = "https://fullnode.testnet.aptoslabs.com/v1"
+
+# 仓库根目录：编译产物路径相对它解析，不依赖当前工作目录
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class DemoStep:
+    """演示步骤：显式声明依赖，调度器据此并发执行无依赖的步骤
+
+    skip_if 接收已完成步骤的结果字典，返回 True 时整步跳过
+    （视为成功），用于幂等短路。
+    """
+    name: str
+    fn: Callable[[], bool]
+    depends_on: Tuple[str, ...] = ()
+    skip_if: Optional[Callable[[Dict[str, bool]], bool]] = None
 
 class USDCDemo:
-    def __init__(self, profile: str = "default"):
+    def __init__(self, profile: str = "default", node_url: str = DEFAULT_NODE_URL):
         self.profile = profile
         self.package_address = "@tinypay"  # 使用命名地址
-        
-    def run_command(self, cmd: List[str], description: str = "") -> Dict[str, Any]:
-        """运行命令并返回结果"""
-        if description:
-            print(f"📋 {description}")
-        
-        print(f"🔧 执行: {' '.join(cmd)}")
-        
+        self.node_url = node_url.rstrip("/")
+        # view 调用复用同一个 HTTP 连接；写操作仍走 CLI（需要密钥签名）
+        self.session = requests.Session() if requests else None
+        # 互不依赖的 view 调用并行发出（子进程调用是 I/O 密集的）
+        self._pool = ThreadPoolExecutor(max_workers=8)
+        # view 结果缓存: (function_id, args, type_args) -> (存入时间, 结果)
+        self._view_cache: Dict[Any, Any] = {}
+        # 步骤 4 记录的余额快照，供存款后打印变化量
+        self._balance_snapshot: Dict[str, int] = {}
+        # 账户地址从本地配置读取一次，省掉每步一个 aptos account list 子进程
+        self.account_address = self._load_account_address()
+        # 函数 ID 与命令前缀只构造一次；元组不可变，可直接用作缓存键
+        base = self.package_address
+        self.FID = SimpleNamespace(
+            is_coin_supported=f"{base}::tinypay::is_coin_supported",
+            add_coin_support=f"{base}::tinypay::add_coin_support",
+            deposit=f"{base}::tinypay::deposit",
+            withdraw_funds=f"{base}::tinypay::withdraw_funds",
+            tinypay_get_balance=f"{base}::tinypay::get_balance",
+            initialize_test_usdc=f"{base}::test_usdc::initialize_test_usdc",
+            mint_to_admin=f"{base}::test_usdc::mint_to_admin",
+            usdc_get_balance=f"{base}::test_usdc::get_balance",
+            get_coin_info=f"{base}::test_usdc::get_coin_info",
+            get_metadata=f"{base}::test_usdc::get_metadata",
+            test_usdc_type=f"{base}::test_usdc::TestUSDC",
+        )
+        self._view_prefix = ("aptos", "move", "view", "--function-id")
+        self._run_prefix = ("aptos", "move", "run", "--profile", self.profile,
+                            "--assume-yes", "--output-format", "json", "--function-id")
+        # 支持该环境变量的 CLI 版本可以跳过每次调用的 profile 查找；
+        # 不支持的版本仍有前缀里的显式 --profile 兜底
+        os.environ["APTOS_PROFILE"] = self.profile
+        # 提交前先模拟：注定失败的交易在本地放弃，不付出块确认等待
+        self.preflight = True
+
+    def _load_account_address(self) -> str:
+        """从 ~/.aptos/config.yaml 解析当前 profile 的账户地址"""
+        config_path = os.path.expanduser("~/.aptos/config.yaml")
+        try:
+            with open(config_path) as f:
+                text = f.read()
+        except OSError:
+            # 读不到配置时退回命名地址，行为与旧版一致
+            return self.package_address
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            print(f"✅ 成功")
-            if result.stdout.strip():
-                print(f"📤 输出: {result.stdout.strip()}")
-            return {"success": True, "output": result.stdout, "error": None}
-        except subprocess.CalledProcessError as e:
+            import yaml
+            profiles = yaml.safe_load(text).get("profiles", {})
+            account = profiles.get(self.profile, {}).get("account")
+        except ImportError:
+            account = self._scan_profile_account(text)
+        if not account:
+            return self.package_address
+        return account if str(account).startswith("0x") else f"0x{account}"
+
+    def _scan_profile_account(self, text: str):
+        """没有 PyYAML 时的最小解析：取 profile 块里的 account 行"""
+        in_profile = False
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped == f"{self.profile}:":
+                in_profile = True
+            elif in_profile:
+                if stripped.startswith("account:"):
+                    return stripped.split(":", 1)[1].strip()
+                if line.startswith("  ") and not line.startswith("   "):
+                    break  # 进入下一个 profile 块
+        return None
+
+    def run_command(self, cmd: List[str], description: str = "", quiet: bool = False, timeout: float = 60.0) -> Dict[str, Any]:
+        """运行命令并返回结果
+
+        stdout 流式读取：非 quiet 时边到达边打印，返回值只保留末尾
+        64 行，大段 JSON 输出不再整体驻留内存。
+        """
+        if not quiet:
+            if description:
+                print(f"📋 {description}")
+            print(f"🔧 执行: {' '.join(cmd)}")
+
+        try:
+            # 独立进程组：超时时连同子进程的子进程一起杀掉，
+            # 否则孙进程会继续持有管道写端，读循环依旧卡住
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, text=True, bufsize=1,
+                                    start_new_session=True)
+        except OSError as e:
+            if not quiet:
+                print(f"❌ 失败")
+                print(f"📤 错误: {e}")
+            return {"success": False, "output": None, "error": str(e)}
+
+        # stderr 由后台线程排空，避免管道写满互相等死
+        stderr_parts: List[str] = []
+        stderr_thread = threading.Thread(
+            target=lambda: stderr_parts.append(proc.stderr.read()))
+        stderr_thread.start()
+
+        # 超时由计时器线程强制执行：到点直接杀掉子进程，读循环随
+        # 管道关闭而退出。挂住的 CLI 即使一直不关 stdout 也会被杀，
+        # 而不是等读循环自然结束后才检查超时
+        timed_out = threading.Event()
+        def _expire():
+            timed_out.set()
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (OSError, AttributeError):
+                proc.kill()
+        timer = threading.Timer(timeout, _expire)
+        timer.start()
+
+        tail = deque(maxlen=64)
+        printed_header = False
+        for line in proc.stdout:
+            tail.append(line)
+            if not quiet and line.strip():
+                if not printed_header:
+                    print("📤 输出:")
+                    printed_header = True
+                print(line, end="")
+
+        returncode = proc.wait()
+        timer.cancel()
+        stderr_thread.join()
+        if timed_out.is_set():
+            if not quiet:
+                print(f"❌ 失败 (超时)")
+            return {"success": False, "output": "".join(tail), "error": "timeout"}
+        error = stderr_parts[0] if stderr_parts else ""
+
+        if returncode == 0:
+            if not quiet:
+                print(f"✅ 成功")
+            return {"success": True, "output": "".join(tail), "error": None}
+        if not quiet:
             print(f"❌ 失败")
-            if e.stderr:
-                print(f"📤 错误: {e.stderr.strip()}")
-            return {"success": False, "output": None, "error": e.stderr}
-    
-    def view_function(self, function_id: str, args: List[str] = None, type_args: List[str] = None, description: str = ""):
-        """调用 view 函数"""
-        cmd = ["aptos", "move", "view", "--function-id", function_id]
-        
-        if args:
-            cmd.extend(["--args"] + args)
-        if type_args:
-            cmd.extend(["--type-args"] + type_args)
-            
-        return self.run_command(cmd, description)
+            if error:
+                print(f"📤 错误: {error.strip()}")
+        return {"success": False, "output": None, "error": error}
+
+    def view_function(self, function_id: str, args: List[str] = None, type_args: List[str] = None, description: str = "", quiet: bool = False, immutable: bool = False, cache_ttl: float = 0.0):
+        """调用 view 函数
+
+        immutable=True 表示结果在一次运行中不会变化（如代币信息），
+        永久缓存；cache_ttl 可为可变数据（如余额）按秒设置短缓存。
+        """
+        key = (function_id, tuple(args or ()), tuple(type_args or ()))
+        cached = self._view_cache.get(key)
+        if cached is not None:
+            stored_at, result = cached
+            if immutable or time.time() - stored_at < cache_ttl:
+                if not quiet and description:
+                    print(f"📋 {description} (缓存)")
+                return result
+
+        # 命名地址（@tinypay）只有 CLI 能解析；真实地址优先走 REST
+        if self.session and not function_id.startswith("@"):
+            result = self._view_via_rest(function_id, args, type_args, description, quiet)
+        else:
+            cmd = [*self._view_prefix, function_id]
+
+            if args:
+                cmd.extend(["--args"] + args)
+            if type_args:
+                cmd.extend(["--type-args"] + type_args)
+
+            result = self.run_command(cmd, description, quiet=quiet)
+        if result["success"]:
+            self._view_cache[key] = (time.time(), result)
+        return result
+
+    def _view_via_rest(self, function_id: str, args: List[str], type_args: List[str], description: str, quiet: bool) -> Dict[str, Any]:
+        """通过全节点 /view 接口查询（持久连接，免去 CLI 进程启动）"""
+        payload = {
+            "function": function_id,
+            "type_arguments": type_args or [],
+            "arguments": [self._parse_cli_arg(a) for a in (args or [])],
+        }
+        if not quiet and description:
+            print(f"📋 {description}")
+        try:
+            response = self.session.post(f"{self.node_url}/view", json=payload, timeout=30)
+            response.raise_for_status()
+            # 输出格式与 CLI 保持一致，方便统一解析
+            output = json.dumps({"Result": response.json()})
+            if not quiet:
+                print(f"✅ 成功")
+                print(f"📤 输出: {output}")
+            return {"success": True, "output": output, "error": None}
+        except Exception as e:
+            if not quiet:
+                print(f"❌ 失败")
+                print(f"📤 错误: {e}")
+            return {"success": False, "output": None, "error": str(e)}
+
+    @staticmethod
+    def _parse_cli_arg(arg: str):
+        """把 CLI 风格的 "type:value" 参数转成 REST JSON 形式"""
+        type_name, _, value = arg.partition(":")
+        if type_name in ("u64", "u128"):
+            return value  # REST 要求 64 位以上整数用字符串表示
+        if type_name in ("u8", "u16", "u32"):
+            return int(value)
+        if type_name == "bool":
+            return value == "true"
+        if type_name == "vector<u8>" or type_name == "hex":
+            if value.startswith("0x"):
+                return value
+            return "0x" + value.encode().hex()
+        # address、string 等直接透传
+        return value
+
+    def invalidate_view_cache(self):
+        """链上写操作成功后清空 view 缓存，避免读到旧余额"""
+        self._view_cache.clear()
+
+    def batch_view(self, calls: List[Dict[str, Any]]) -> List[Any]:
+        """把一组 view 查询当作一个批次发出，返回解析后的 Result 列表
+
+        全节点的 /v1/view 不提供真正的批量接口，因此批次在共享连接上
+        并发发出，等效于一次往返；解析失败的条目返回 None。
+        """
+        results = self._dispatch_views(calls)
+        parsed = []
+        for result in results:
+            if result["success"] and result["output"]:
+                try:
+                    parsed.append(json.loads(result["output"]).get("Result"))
+                    continue
+                except ValueError:
+                    pass
+            parsed.append(None)
+        return parsed
+
+    def _dispatch_views(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """并发发出一组 view 调用，按提交顺序返回原始结果"""
+        return list(self._pool.map(
+            lambda kwargs: self.view_function(quiet=True, **kwargs), calls
+        ))
+
+    def run_views_parallel(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """并行发起多个互不依赖的 view 调用，按提交顺序返回并打印结果"""
+        results = self._dispatch_views(calls)
+        # 调用期间不打印，避免并行输出交错；拿到结果后统一打印
+        for kwargs, result in zip(calls, results):
+            if kwargs.get("description"):
+                print(f"📋 {kwargs['description']}")
+            if result["success"]:
+                print(f"✅ 成功")
+                if result["output"] and result["output"].strip():
+                    print(f"📤 输出: {result['output'].strip()}")
+            else:
+                print(f"❌ 失败")
+                if result["error"]:
+                    print(f"📤 错误: {result['error'].strip()}")
+        return results
     
+    def _degrade_run_prefix(self, error: str) -> bool:
+        """CLI 不认识 --output-format 时把它从前缀里永久移除
+
+        与 --simulate 的降级同理：旧版 clap 在运行任何东西之前就会
+        拒绝未知参数，不降级的话所有 entry 调用都会失败。
+        """
+        if "--output-format" in error and "--output-format" in self._run_prefix:
+            self._run_prefix = tuple(
+                flag for flag in self._run_prefix if flag not in ("--output-format", "json"))
+            return True
+        return False
+
     def run_function(self, function_id: str, args: List[str] = None, type_args: List[str] = None, description: str = ""):
-        """运行 entry 函数"""
-        cmd = ["aptos", "move", "run", "--function-id", function_id, "--profile", self.profile, "--assume-yes"]
-        
+        """运行 entry 函数（先模拟预检，再提交并等待交易确认）"""
+        tail = [function_id]
         if args:
-            cmd.extend(["--args"] + args)
+            tail.extend(["--args"] + args)
         if type_args:
-            cmd.extend(["--type-args"] + type_args)
-            
-        return self.run_command(cmd, description)
+            tail.extend(["--type-args"] + type_args)
+        cmd = [*self._run_prefix, *tail]
+
+        if self.preflight:
+            sim = self.run_command(cmd + ["--simulate"], quiet=True)
+            if not sim["success"] and self._degrade_run_prefix(sim["error"] or ""):
+                cmd = [*self._run_prefix, *tail]
+                sim = self.run_command(cmd + ["--simulate"], quiet=True)
+            if not sim["success"]:
+                error = sim["error"] or ""
+                if "--simulate" in error or "unexpected argument" in error.lower():
+                    # 当前 CLI 版本不认识 --simulate，之后不再预检
+                    self.preflight = False
+                else:
+                    # 模拟已判定失败：本地放弃，省下提交和出块等待
+                    if description:
+                        print(f"📋 {description}")
+                    print(f"❌ 预检失败: {error.strip()}")
+                    return {"success": False, "output": None, "error": error,
+                            "tx_hash": None, "version": None}
+
+        result = self.run_command(cmd, description)
+        if not result["success"] and self._degrade_run_prefix(result["error"] or ""):
+            cmd = [*self._run_prefix, *tail]
+            result = self.run_command(cmd, description)
+        result["tx_hash"] = None
+        result["version"] = None
+        if result["success"]:
+            try:
+                data = json.loads(result["output"])["Result"]
+                result["tx_hash"] = data.get("transaction_hash")
+                result["version"] = data.get("version")
+            except (ValueError, KeyError, TypeError):
+                pass
+            # CLI 输出里没有确认信息时，主动轮询直到交易上链
+            if result["tx_hash"] and result["version"] is None:
+                tx = self._wait_for_transaction(result["tx_hash"])
+                result["version"] = tx.get("version")
+        return result
+
+    def _wait_for_transaction(self, tx_hash: str, timeout: float = 10.0) -> Dict[str, Any]:
+        """轮询全节点直到交易脱离 pending（取代步骤间的固定 sleep）"""
+        if not (self.session and tx_hash):
+            return {}
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                response = self.session.get(
+                    f"{self.node_url}/transactions/by_hash/{tx_hash}", timeout=10
+                )
+                if response.status_code == 200:
+                    tx = response.json()
+                    if tx.get("type") != "pending_transaction":
+                        return tx
+            except Exception:
+                pass
+            time.sleep(0.1)
+        return {}
     
     def demo_step_1_check_initial_state(self):
         """步骤 1: 检查初始状态"""
@@ -62,92 +384,144 @@ class USDCDemo:
         
         # 检查 APT 是否支持
         self.view_function(
-            f"{self.package_address}::tinypay::is_coin_supported",
+            self.FID.is_coin_supported,
             type_args=["0x1::aptos_coin::AptosCoin"],
-            description="检查 APT 支持状态"
+            description="检查 APT 支持状态",
+            immutable=True
         )
         
-        # 检查 USDC 是否支持
+        # 检查 USDC 是否支持（view 输出是 {"Result": [...]} JSON，
+        # 解析布尔字段而不是在原始文本里找 "false" 子串）
         result = self.view_function(
-            f"{self.package_address}::tinypay::is_coin_supported",
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
+            self.FID.is_coin_supported,
+            type_args=[self.FID.test_usdc_type],
             description="检查 USDC 支持状态"
         )
-        
-        if result["success"] and "false" in result["output"]:
-            print("💡 USDC 尚未支持，需要先添加支持")
+
+        if not result["success"]:
             return False
-        return True
+        try:
+            supported = json.loads(result["output"])["Result"][0] is True
+        except (ValueError, KeyError, IndexError, TypeError):
+            supported = False
+        if not supported:
+            print("💡 USDC 尚未支持，需要先添加支持")
+        return supported
     
     def demo_step_2_setup_usdc(self):
-        """步骤 2: 设置 USDC"""
+        """步骤 2: 设置 USDC（已设置过则直接跳过）"""
         print("\n🛠️ 步骤 2: 设置 USDC")
         print("=" * 50)
-        
+
+        # 幂等短路：支持已就位时不再提交两笔只会 abort 的交易
+        check = self.view_function(
+            self.FID.is_coin_supported,
+            type_args=[self.FID.test_usdc_type],
+            quiet=True
+        )
+        if check["success"]:
+            try:
+                if json.loads(check["output"])["Result"][0] is True:
+                    print("⏭️ USDC 已支持，跳过设置")
+                    return True
+            except (ValueError, KeyError, IndexError, TypeError):
+                pass
+
         # 初始化 USDC
         result1 = self.run_function(
-            f"{self.package_address}::test_usdc::initialize_test_usdc",
+            self.FID.initialize_test_usdc,
             description="初始化测试网 USDC"
         )
         
         # 添加 USDC 支持
         result2 = self.run_function(
-            f"{self.package_address}::tinypay::add_coin_support",
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
+            self.FID.add_coin_support,
+            type_args=[self.FID.test_usdc_type],
             description="为 TinyPay 添加 USDC 支持"
         )
         
         return result1["success"] and result2["success"]
     
     def demo_step_3_mint_usdc(self):
-        """步骤 3: 铸造 USDC"""
+        """步骤 3: 铸造 USDC（余额已足够则跳过）"""
         print("\n💰 步骤 3: 铸造测试 USDC")
         print("=" * 50)
-        
+
+        # 幂等短路：重复运行时余额通常已经够了
+        check = self.view_function(
+            self.FID.usdc_get_balance,
+            args=[f"address:{self.account_address}"],
+            quiet=True
+        )
+        if check["success"]:
+            try:
+                if int(json.loads(check["output"])["Result"][0]) >= 10000000000:
+                    print("⏭️ 余额已足够，跳过铸造")
+                    return True
+            except (ValueError, KeyError, IndexError, TypeError):
+                pass
+
         # 为管理员铸造 10,000 USDC
         result = self.run_function(
-            f"{self.package_address}::test_usdc::mint_to_admin",
+            self.FID.mint_to_admin,
             args=["u64:10000000000"],  # 10,000 USDC (6 decimals)
             description="为管理员铸造 10,000 USDC"
         )
         
         return result["success"]
     
+    def _balance_calls(self, account_address: str) -> List[Dict[str, Any]]:
+        """钱包余额和 TinyPay 余额的两个 view 查询"""
+        return [
+            {
+                "function_id": self.FID.usdc_get_balance,
+                "args": [f"address:{account_address}"],
+                "description": "检查钱包中的 USDC 余额",
+            },
+            {
+                "function_id": self.FID.tinypay_get_balance,
+                "args": [f"address:{account_address}"],
+                "type_args": [self.FID.test_usdc_type],
+                "description": "检查 TinyPay 中的 USDC 余额",
+            },
+        ]
+
+    @staticmethod
+    def _parse_balances(results: List[Dict[str, Any]]) -> Dict[str, int]:
+        """从两个余额查询结果里取出数值，解析不出的键省略"""
+        balances = {}
+        for name, result in zip(("wallet", "tinypay"), results):
+            try:
+                balances[name] = int(json.loads(result["output"])["Result"][0])
+            except (ValueError, KeyError, IndexError, TypeError):
+                pass
+        return balances
+
+    def _print_balance_delta(self):
+        """与步骤 4 的快照对比，打印存款造成的余额变化"""
+        if not self._balance_snapshot:
+            return
+        results = self._dispatch_views(self._balance_calls(self.account_address))
+        current = self._parse_balances(results)
+        for name, label in (("wallet", "钱包 USDC"), ("tinypay", "TinyPay USDC")):
+            if name in current and name in self._balance_snapshot:
+                delta = current[name] - self._balance_snapshot[name]
+                print(f"📊 {label} 余额变化: {delta:+d}")
+
     def demo_step_4_check_balances(self):
-        """步骤 4: 检查余额"""
+        """步骤 4: 检查余额并记录快照"""
         print("\n💳 步骤 4: 检查余额")
         print("=" * 50)
-        
-        # 获取当前账户地址
-        result = subprocess.run(
-            ["aptos", "account", "list", "--profile", self.profile],
-            capture_output=True, text=True
-        )
-        
-        if result.returncode != 0:
-            print("❌ 无法获取账户地址")
-            return False
-        
-        # 简化处理，使用命名地址
-        account_address = self.package_address
-        
-        # 检查 USDC 钱包余额
-        self.view_function(
-            f"{self.package_address}::test_usdc::get_balance",
-            args=[f"address:{account_address}"],
-            description="检查钱包中的 USDC 余额"
-        )
-        
-        # 检查 TinyPay 中的 USDC 余额
-        self.view_function(
-            f"{self.package_address}::tinypay::get_balance",
-            args=[f"address:{account_address}"],
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
-            description="检查 TinyPay 中的 USDC 余额"
-        )
-        
+
+        # 账户地址在 __init__ 时已从配置解析
+        account_address = self.account_address
+
+        # 两个余额查询互不依赖，并行发出；结果同时作为存款前的快照
+        results = self.run_views_parallel(self._balance_calls(account_address))
+        self._balance_snapshot = self._parse_balances(results)
+
         return True
-    
+
     def demo_step_5_deposit_usdc(self):
         """步骤 5: 存入 USDC"""
         print("\n📥 步骤 5: 存入 USDC 到 TinyPay")
@@ -155,83 +529,164 @@ class USDCDemo:
         
         # 存入 1,000 USDC
         result = self.run_function(
-            f"{self.package_address}::tinypay::deposit",
+            self.FID.deposit,
             args=["u64:1000000000", "vector<u8>:demo_tail_hash"],
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
+            type_args=[self.FID.test_usdc_type],
             description="存入 1,000 USDC 到 TinyPay"
         )
-        
+
+        if result["success"]:
+            # 存款改变了余额，作废已缓存的 view 结果
+            self.invalidate_view_cache()
+
         return result["success"]
     
-    def demo_step_6_check_balances_after_deposit(self):
-        """步骤 6: 存款后检查余额"""
-        print("\n💳 步骤 6: 存款后检查余额")
+    def _resolve_usdc_metadata(self) -> Optional[str]:
+        """通过 test_usdc::get_metadata view 解析 USDC 元数据对象地址"""
+        result = self.view_function(self.FID.get_metadata, quiet=True, immutable=True)
+        if not result["success"]:
+            return None
+        try:
+            value = json.loads(result["output"])["Result"][0]
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+        # Object<Metadata> 在 view 输出里序列化为 {"inner": "0x..."}
+        if isinstance(value, dict):
+            value = value.get("inner")
+        return value if isinstance(value, str) and value.startswith("0x") else None
+
+    def demo_deposit_then_withdraw_fused(self, metadata_address: str = None,
+                                         deposit_amount: int = 1000000000,
+                                         withdraw_amount: int = 500000000,
+                                         tail: str = "demo_tail_hash"):
+        """步骤 5+6: 用单笔脚本交易完成存入+提取
+
+        两笔 entry 调用各等待一次出块；编译好的
+        demo_deposit_then_withdraw 脚本把两步合并为一笔原子交易。
+        元数据地址默认通过 test_usdc::get_metadata 解析；
+        脚本产物或元数据地址不可用时回退为原来的两步。
+        """
+        print("\n📥📤 步骤 5+6: 存入并提取 USDC")
         print("=" * 50)
-        
-        account_address = self.package_address
-        
-        # 检查 USDC 钱包余额
-        self.view_function(
-            f"{self.package_address}::test_usdc::get_balance",
-            args=[f"address:{account_address}"],
-            description="检查钱包中的 USDC 余额"
-        )
-        
-        # 检查 TinyPay 中的 USDC 余额
-        self.view_function(
-            f"{self.package_address}::tinypay::get_balance",
-            args=[f"address:{account_address}"],
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
-            description="检查 TinyPay 中的 USDC 余额"
-        )
-        
-        return True
-    
-    def demo_step_7_withdraw_usdc(self):
-        """步骤 7: 提取 USDC"""
-        print("\n📤 步骤 7: 从 TinyPay 提取 USDC")
+
+        if metadata_address is None:
+            metadata_address = self._resolve_usdc_metadata()
+        script_path = os.path.join(_REPO_ROOT, "build", "tinypay",
+                                   "bytecode_scripts", "demo_deposit_then_withdraw.mv")
+        if not metadata_address or not os.path.exists(script_path):
+            print("⚠️ 脚本产物或元数据地址不可用，回退为两笔交易")
+            return self.demo_step_5_deposit_usdc() and self.demo_step_6_withdraw_usdc()
+
+        result = self.run_command([
+            "aptos", "move", "run-script",
+            "--compiled-script-path", script_path,
+            "--args",
+            f"address:{metadata_address}",
+            f"u64:{deposit_amount}",
+            f"vector<u8>:{tail}",
+            f"u64:{withdraw_amount}",
+            "--profile", self.profile,
+            "--assume-yes",
+        ], description="单笔交易内存入并提取")
+
+        if result["success"]:
+            self.invalidate_view_cache()
+            # 与步骤 4 的快照对比，打印这笔交易造成的净余额变化
+            self._print_balance_delta()
+            return True
+
+        print("⚠️ 脚本执行失败，回退为两笔交易")
+        return self.demo_step_5_deposit_usdc() and self.demo_step_6_withdraw_usdc()
+
+    def demo_step_6_withdraw_usdc(self):
+        """步骤 6: 提取 USDC（先打印存款带来的余额变化）"""
+        print("\n📤 步骤 6: 从 TinyPay 提取 USDC")
         print("=" * 50)
-        
+
+        # 与步骤 4 的快照对比，取代原先整段重查一遍的"存款后余额"步骤
+        self._print_balance_delta()
+
         # 提取 500 USDC
         result = self.run_function(
-            f"{self.package_address}::tinypay::withdraw_funds",
+            self.FID.withdraw_funds,
             args=["u64:500000000"],
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
+            type_args=[self.FID.test_usdc_type],
             description="从 TinyPay 提取 500 USDC"
         )
-        
+
+        if result["success"]:
+            # 提款改变了余额，作废已缓存的 view 结果
+            self.invalidate_view_cache()
+
         return result["success"]
     
-    def demo_step_8_final_balances(self):
-        """步骤 8: 最终余额检查"""
-        print("\n💳 步骤 8: 最终余额检查")
+    def demo_step_7_final_balances(self):
+        """步骤 7: 最终余额检查"""
+        print("\n💳 步骤 7: 最终余额检查")
         print("=" * 50)
-        
-        account_address = self.package_address
-        
-        # 检查 USDC 钱包余额
-        self.view_function(
-            f"{self.package_address}::test_usdc::get_balance",
-            args=[f"address:{account_address}"],
-            description="检查钱包中的 USDC 余额"
-        )
-        
-        # 检查 TinyPay 中的 USDC 余额
-        self.view_function(
-            f"{self.package_address}::tinypay::get_balance",
-            args=[f"address:{account_address}"],
-            type_args=[f"{self.package_address}::test_usdc::TestUSDC"],
-            description="检查 TinyPay 中的 USDC 余额"
-        )
-        
-        # 检查 USDC 代币信息
-        self.view_function(
-            f"{self.package_address}::test_usdc::get_coin_info",
-            description="检查 USDC 代币信息"
-        )
-        
+
+        account_address = self.account_address
+
+        # 余额查询加代币信息，互不依赖，并行发出
+        calls = self._balance_calls(account_address)
+        calls.append({
+            "function_id": self.FID.get_coin_info,
+            "description": "检查 USDC 代币信息",
+            "immutable": True,
+        })
+        self.run_views_parallel(calls)
+
         return True
     
+    def _run_pipeline(self, steps: List[DemoStep]) -> bool:
+        """按依赖图调度步骤，依赖满足的步骤并发提交
+
+        返回 False 表示某步骤抛了异常（与旧的顺序循环一致，
+        返回 False 的步骤算"部分完成"，不中断流程）。
+        """
+        index = {step.name: i for i, step in enumerate(steps, 1)}
+        results: Dict[str, bool] = {}
+        futures: Dict[Any, str] = {}
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            while len(results) < len(steps):
+                progressed = False
+                pending = set(futures.values())
+                for step in steps:
+                    if step.name in results or step.name in pending:
+                        continue
+                    if not all(dep in results for dep in step.depends_on):
+                        continue
+                    if step.skip_if and step.skip_if(results):
+                        print(f"⏭️ 步骤 {index[step.name]} 跳过: {step.name}")
+                        results[step.name] = True
+                        progressed = True
+                        continue
+                    futures[pool.submit(step.fn)] = step.name
+                    progressed = True
+                if futures:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        step_name = futures.pop(future)
+                        i = index[step_name]
+                        try:
+                            success = bool(future.result())
+                        except Exception as e:
+                            print(f"❌ 步骤 {i} 失败: {step_name}")
+                            print(f"错误: {e}")
+                            for remaining in futures:
+                                remaining.cancel()
+                            return False
+                        results[step_name] = success
+                        if success:
+                            print(f"✅ 步骤 {i} 完成: {step_name}")
+                        else:
+                            print(f"⚠️ 步骤 {i} 部分完成: {step_name}")
+                elif not progressed:
+                    # 依赖图有环或缺失，避免空转
+                    print("❌ 存在无法满足的步骤依赖，终止")
+                    return False
+        return True
+
     def run_complete_demo(self):
         """运行完整演示"""
         print("🚀 TinyPay USDC 功能演示")
@@ -240,41 +695,30 @@ class USDCDemo:
         print("1. 检查初始状态")
         print("2. 设置 USDC 支持")
         print("3. 铸造测试代币")
-        print("4. 检查余额")
-        print("5. 存入 USDC")
-        print("6. 检查存款后余额")
-        print("7. 提取 USDC")
-        print("8. 最终余额检查")
+        print("4. 检查余额（记录快照）")
+        print("5+6. 存入并提取 USDC（优先合并为单笔脚本交易）")
+        print("7. 最终余额检查")
         print("=" * 60)
         
         steps = [
-            ("检查初始状态", self.demo_step_1_check_initial_state),
-            ("设置 USDC", self.demo_step_2_setup_usdc),
-            ("铸造 USDC", self.demo_step_3_mint_usdc),
-            ("检查余额", self.demo_step_4_check_balances),
-            ("存入 USDC", self.demo_step_5_deposit_usdc),
-            ("存款后余额", self.demo_step_6_check_balances_after_deposit),
-            ("提取 USDC", self.demo_step_7_withdraw_usdc),
-            ("最终余额", self.demo_step_8_final_balances),
+            DemoStep("检查初始状态", self.demo_step_1_check_initial_state),
+            DemoStep("设置 USDC", self.demo_step_2_setup_usdc,
+                     depends_on=("检查初始状态",),
+                     # 步骤 1 已确认支持时省掉两笔链上交易
+                     skip_if=lambda results: results.get("检查初始状态") is True),
+            DemoStep("铸造 USDC", self.demo_step_3_mint_usdc,
+                     depends_on=("设置 USDC",)),
+            DemoStep("检查余额", self.demo_step_4_check_balances,
+                     depends_on=("铸造 USDC",)),
+            DemoStep("存入并提取 USDC", self.demo_deposit_then_withdraw_fused,
+                     depends_on=("检查余额",)),
+            DemoStep("最终余额", self.demo_step_7_final_balances,
+                     depends_on=("存入并提取 USDC",)),
         ]
-        
-        for i, (step_name, step_func) in enumerate(steps, 1):
-            try:
-                success = step_func()
-                if success:
-                    print(f"✅ 步骤 {i} 完成: {step_name}")
-                else:
-                    print(f"⚠️ 步骤 {i} 部分完成: {step_name}")
-                
-                # 在步骤之间添加短暂延迟
-                if i < len(steps):
-                    time.sleep(1)
-                    
-            except Exception as e:
-                print(f"❌ 步骤 {i} 失败: {step_name}")
-                print(f"错误: {str(e)}")
-                return False
-        
+
+        if not self._run_pipeline(steps):
+            return False
+
         print("\n🎉 演示完成!")
         print("\n📋 总结:")
         print("- ✅ USDC 代币已成功集成到 TinyPay")
@@ -0,0 +1,19 @@
+/// Demo script that deposits into TinyPay and withdraws again in one
+/// atomic transaction, so scenario demos exercising both paths pay a
+/// single block-commit latency instead of two.
+script {
+    use aptos_framework::fungible_asset::Metadata;
+    use aptos_framework::object::Object;
+    use tinypay::tinypay;
+
+    fun demo_deposit_then_withdraw(
+        user: &signer,
+        asset_metadata: Object<Metadata>,
+        deposit_amount: u64,
+        tail: vector<u8>,
+        withdraw_amount: u64
+    ) {
+        tinypay::deposit(user, asset_metadata, deposit_amount, tail);
+        tinypay::withdraw_funds(user, asset_metadata, withdraw_amount);
+    }
+}